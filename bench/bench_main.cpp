@@ -34,6 +34,7 @@ struct Config {
     int seed = 42;
     std::string csv_path;
     std::string impl = "naive";
+    std::string format = "text";  // "text" (key=value) or "json" (one object per result)
     int MB = 256, NB = 256, KB = 256;
 };
 
@@ -59,6 +60,8 @@ Config parse_args(int argc, char** argv) {
             config.csv_path = argv[++i];
         } else if (arg == "--impl" && i + 1 < argc) {
             config.impl = argv[++i];
+        } else if (arg == "--format" && i + 1 < argc) {
+            config.format = argv[++i];
         } else if (arg == "--MB" && i + 1 < argc) {
             config.MB = std::stoi(argv[++i]);
         } else if (arg == "--NB" && i + 1 < argc) {
@@ -302,13 +305,24 @@ int main(int argc, char** argv) {
                        (config.impl == "packed") ? "packed+openmp" :
                        (config.impl == "mk_avx2") ? "mk_avx2+openmp" :
                        (config.impl == "openblas") ? "openblas" : "baseline";
-    std::cout << "impl=" << config.impl << ",M=" << config.M << ",N=" << config.N 
-              << ",K=" << config.K << ",threads=" << config.threads 
-              << ",MB=" << config.MB << ",NB=" << config.NB << ",KB=" << config.KB 
-              << ",time_ms=" << std::fixed << std::setprecision(3) << best_time_ms
-              << ",gflops=" << std::setprecision(2) << gflops 
-              << ",relerr=" << std::scientific << std::setprecision(1) << final_relerr 
-              << ",notes=" << notes << "\n";
+    if (config.format == "json") {
+        // Single-line JSON object for machine parsing (impl/notes never need escaping)
+        std::cout << "{\"impl\":\"" << config.impl << "\",\"M\":" << config.M << ",\"N\":" << config.N 
+                  << ",\"K\":" << config.K << ",\"threads\":" << config.threads 
+                  << ",\"MB\":" << config.MB << ",\"NB\":" << config.NB << ",\"KB\":" << config.KB 
+                  << ",\"time_ms\":" << std::fixed << std::setprecision(3) << best_time_ms
+                  << ",\"gflops\":" << std::setprecision(2) << gflops 
+                  << ",\"relerr\":" << std::scientific << std::setprecision(1) << final_relerr 
+                  << ",\"notes\":\"" << notes << "\"}\n";
+    } else {
+        std::cout << "impl=" << config.impl << ",M=" << config.M << ",N=" << config.N 
+                  << ",K=" << config.K << ",threads=" << config.threads 
+                  << ",MB=" << config.MB << ",NB=" << config.NB << ",KB=" << config.KB 
+                  << ",time_ms=" << std::fixed << std::setprecision(3) << best_time_ms
+                  << ",gflops=" << std::setprecision(2) << gflops 
+                  << ",relerr=" << std::scientific << std::setprecision(1) << final_relerr 
+                  << ",notes=" << notes << "\n";
+    }
     
     // Write results to CSV if output file is specified
     if (!config.csv_path.empty()) {
@@ -4,117 +4,445 @@ Auto-tune GEMM tile sizes for different thread counts.
 Finds optimal MB, NB, KB parameters for 1, 2, 4, 8 threads.
 """
 
-import subprocess
+import argparse
+import functools
+import hashlib
+import heapq
 import json
 import os
+import random
+import sqlite3
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from itertools import product
 import statistics
 
-def run_benchmark(impl, N, MB, NB, KB, threads, reps=3):
-    """Run benchmark and return median GFLOP/s"""
+try:
+    import optuna
+except ImportError:
+    optuna = None
+
+from cpu_affinity import (bench_cpus, bench_env, free_cpu_count, init_worker, pin_and_exec,
+                          pin_driver, worker_cpus, worker_slots)
+
+# Parameter ranges to search
+MB_VALUES = [128, 192, 256, 320]
+NB_VALUES = [128, 192, 256, 320]
+KB_VALUES = [96, 128, 160, 192, 256]
+
+# Test sizes
+TEST_SIZES = [2048, 4096]
+
+# Micro-kernel register tile (mk8x8_avx2); MB/NB must be multiples of it
+MR, NR = 8, 8
+
+# Per-core L2 used to prune tiles whose working set cannot stay cache-resident
+L2_KB_PER_CORE = 1280
+L2_BUDGET_FRACTION = 0.75
+
+BENCH_EXE = './gemm_bench.exe'
+
+# Persistent result cache, invalidated automatically when the binary changes
+CACHE_DB = 'data/bench_cache.sqlite'
+_use_cache = True
+
+# Bayesian search settings
+TPE_TRIALS = 25
+TPE_STARTUP_TRIALS = 8
+PLATEAU_TOP_K = 5
+PLATEAU_TOLERANCE = 0.10
+
+# Grid search only stops on a plateau after exploring this fraction of the grid
+EARLY_STOP_MIN_FRACTION = 0.25
+
+@functools.lru_cache(maxsize=None)
+def _exe_hash():
+    """Short SHA-256 of the benchmark binary, so rebuilds never hit stale cache rows"""
+    with open(BENCH_EXE, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def _cache_key(impl, N, MB, NB, KB, threads, reps):
+    return json.dumps([impl, N, MB, NB, KB, threads, reps, _exe_hash()])
+
+def _cache_get(key):
+    """Return the cached GFLOP/s for key, or None on a miss"""
+    os.makedirs(os.path.dirname(CACHE_DB), exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
     try:
-        # Set environment variables for thread count
-        env = os.environ.copy()
-        env['OMP_NUM_THREADS'] = str(threads)
-        env['OMP_PLACES'] = 'cores'
-        env['OMP_PROC_BIND'] = 'close'
-        
-        cmd = [
-            './gemm_bench.exe',
-            '--impl', impl,
-            '--N', str(N),
-            '--MB', str(MB),
-            '--NB', str(NB), 
-            '--KB', str(KB),
-            '--reps', str(reps)
-        ]
+        conn.execute('CREATE TABLE IF NOT EXISTS results(key TEXT PRIMARY KEY, gflops REAL)')
+        row = conn.execute('SELECT gflops FROM results WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+    finally:
+        conn.close()
+
+def _cache_put(key, gflops):
+    """Store a successful result; failures are never cached"""
+    if gflops <= 0:
+        return
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    try:
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?)', (key, gflops))
+    finally:
+        conn.close()
+
+def cached_benchmark(func):
+    """Memoize successful benchmark results in CACHE_DB across runs"""
+    @functools.wraps(func)
+    def wrapper(impl, N, MB, NB, KB, threads, reps=3, cpu_set=None):
+        if not _use_cache:
+            return func(impl, N, MB, NB, KB, threads, reps, cpu_set)
         
-        result = subprocess.run(cmd, capture_output=True, text=True, env=env)
+        key = _cache_key(impl, N, MB, NB, KB, threads, reps)
+        gflops = _cache_get(key)
+        if gflops is None:
+            gflops = func(impl, N, MB, NB, KB, threads, reps, cpu_set)
+            _cache_put(key, gflops)
+        return gflops
+    return wrapper
+
+def _bench_cmd(impl, N, MB, NB, KB, reps):
+    return [
+        BENCH_EXE,
+        '--impl', impl,
+        '--N', str(N),
+        '--MB', str(MB),
+        '--NB', str(NB), 
+        '--KB', str(KB),
+        '--reps', str(reps),
+        '--format', 'json'
+    ]
+
+def _parse_gflops(stdout):
+    """Parse GFLOP/s from the JSON result line"""
+    for line in stdout.splitlines():
+        if line.startswith('{'):
+            return float(json.loads(line)['gflops'])
+    return 0.0
+
+@cached_benchmark
+def run_benchmark(impl, N, MB, NB, KB, threads, reps=3, cpu_set=None):
+    """Run benchmark and return median GFLOP/s, optionally pinned to the logical CPUs in cpu_set"""
+    try:
+        returncode, stdout, stderr = pin_and_exec(_bench_cmd(impl, N, MB, NB, KB, reps),
+                                                  bench_env(threads, cpu_set),
+                                                  bench_cpus(threads, cpu_set))
         
-        if result.returncode != 0:
-            print(f"Error running benchmark: {result.stderr}")
+        if returncode != 0:
+            print(f"Error running benchmark: {stderr}")
             return 0.0
-            
-        # Parse GFLOP/s from output
-        lines = result.stdout.split('\n')
-        for line in lines:
-            if 'gflops=' in line:
-                # Extract gflops value
-                parts = line.split('gflops=')
-                if len(parts) > 1:
-                    gflops_str = parts[1].split(',')[0]
-                    return float(gflops_str)
         
-        return 0.0
+        return _parse_gflops(stdout)
         
     except Exception as e:
         print(f"Exception running benchmark: {e}")
         return 0.0
 
-def autotune_thread_count(threads, impl='mk_avx2'):
-    """Auto-tune tile sizes for a specific thread count"""
-    print(f"\n=== Auto-tuning for {threads} threads ===")
+def evaluate_config(impl, MB, NB, KB, threads, cpu_set=None):
+    """Benchmark one tile config on all test sizes, returning {N: GFLOP/s} for successful runs"""
+    scores = {}
+    for N in TEST_SIZES:
+        gflops = run_benchmark(impl, N, MB, NB, KB, threads, reps=2, cpu_set=cpu_set)
+        if gflops > 0:
+            scores[N] = gflops
+    return scores
+
+def report_scores(scores):
+    """Print per-size results and return their mean GFLOP/s (0.0 on failure)"""
+    for N, gflops in scores.items():
+        print(f"  N={N}: {gflops:.2f} GFLOP/s")
     
-    # Parameter ranges to search
-    MB_values = [128, 192, 256, 320]
-    NB_values = [128, 192, 256, 320] 
-    KB_values = [96, 128, 160, 192, 256]
+    if not scores:
+        print("  Failed to get valid results")
+        return 0.0
     
-    # Test sizes
-    test_sizes = [2048, 4096]
+    avg_score = statistics.mean(scores.values())
+    print(f"  Average: {avg_score:.2f} GFLOP/s")
+    return avg_score
+
+def concurrent_slots(threads):
+    """Number of disjoint CPU sets of size threads to benchmark on at once"""
+    cores = free_cpu_count()
+    if threads >= cores // 2:
+        return 1
+    return cores // threads
+
+def _init_worker(cpu_slots, use_cache):
+    """Claim a disjoint CPU set and the driver's cache setting for this pool worker"""
+    global _use_cache
+    init_worker(cpu_slots)
+    _use_cache = use_cache
+
+def _evaluate_pinned(impl, MB, NB, KB, threads):
+    return evaluate_config(impl, MB, NB, KB, threads, cpu_set=worker_cpus())
+
+def iter_evaluations(configs, threads, impl):
+    """Yield ((MB, NB, KB), scores) for each config, in completion order.
+    
+    When a benchmark leaves most cores idle, configs run concurrently in
+    cores // threads worker processes, each pinned to its own CPU set.
+    """
+    workers = concurrent_slots(threads)
+    if workers == 1:
+        for MB, NB, KB in configs:
+            yield (MB, NB, KB), evaluate_config(impl, MB, NB, KB, threads)
+        return
     
+    print(f"Running {workers} benchmarks concurrently ({threads} CPU(s) each)")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(worker_slots(workers, threads), _use_cache)) as pool:
+        futures = {pool.submit(_evaluate_pinned, impl, MB, NB, KB, threads): (MB, NB, KB)
+                   for MB, NB, KB in configs}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # Drop queued configs if the caller stopped early
+            pool.shutdown(cancel_futures=True)
+
+def is_plateau(scores):
+    """True once the top-K non-zero scores lie within PLATEAU_TOLERANCE of each other"""
+    top = sorted((s for s in scores if s > 0), reverse=True)[:PLATEAU_TOP_K]
+    if len(top) < PLATEAU_TOP_K:
+        return False
+    return (top[0] - top[-1]) / top[0] < PLATEAU_TOLERANCE
+
+def is_viable(MB, NB, KB, threads):
+    """Reject tiles that cannot map onto the micro-kernel or would thrash L2"""
+    if MB % MR or NB % NR:
+        return False
+    working_set = 4 * (MB * KB + KB * NB + MB * NB)
+    return working_set <= L2_BUDGET_FRACTION * L2_KB_PER_CORE * 1024 * threads
+
+def grid_search(threads, impl):
+    """Search the MB x NB x KB grid, skipping tiles rejected by is_viable"""
     best_config = None
     best_score = 0.0
     
-    total_configs = len(MB_values) * len(NB_values) * len(KB_values)
+    grid = list(product(MB_VALUES, NB_VALUES, KB_VALUES))
+    configs = [cfg for cfg in grid if is_viable(*cfg, threads)]
+    total_configs = len(configs)
+    print(f"Pruned {len(grid) - total_configs}/{len(grid)} configs exceeding the "
+          f"{L2_KB_PER_CORE} KB/core L2 budget")
+    # Visit the grid in a fixed shuffled order so an early stop has sampled every axis,
+    # not just the smallest MB values
+    random.Random(0).shuffle(configs)
     config_count = 0
+    top_scores = []  # min-heap of the PLATEAU_TOP_K best non-zero scores
     
-    for MB, NB, KB in product(MB_values, NB_values, KB_values):
+    evaluations = iter_evaluations(configs, threads, impl)
+    for (MB, NB, KB), scores in evaluations:
         config_count += 1
-        print(f"Testing config {config_count}/{total_configs}: MB={MB}, NB={NB}, KB={KB}")
+        print(f"Tested config {config_count}/{total_configs}: MB={MB}, NB={NB}, KB={KB}")
+        
+        avg_score = report_scores(scores)
+        if avg_score > best_score:
+            best_score = avg_score
+            best_config = {'MB': MB, 'NB': NB, 'KB': KB}
+            print(f"  *** NEW BEST: {avg_score:.2f} GFLOP/s ***")
         
-        # Test on multiple sizes and take average
-        scores = []
-        for N in test_sizes:
-            gflops = run_benchmark(impl, N, MB, NB, KB, threads, reps=2)
-            if gflops > 0:
-                scores.append(gflops)
-                print(f"  N={N}: {gflops:.2f} GFLOP/s")
+        if avg_score > 0:
+            heapq.heappush(top_scores, avg_score)
+            if len(top_scores) > PLATEAU_TOP_K:
+                heapq.heappop(top_scores)
         
-        if scores:
-            avg_score = statistics.mean(scores)
-            print(f"  Average: {avg_score:.2f} GFLOP/s")
-            
-            if avg_score > best_score:
-                best_score = avg_score
-                best_config = {'MB': MB, 'NB': NB, 'KB': KB}
-                print(f"  *** NEW BEST: {avg_score:.2f} GFLOP/s ***")
-        else:
-            print("  Failed to get valid results")
+        if (config_count >= EARLY_STOP_MIN_FRACTION * total_configs
+                and config_count < total_configs and is_plateau(top_scores)):
+            print(f"Stopped early at config {config_count}/{total_configs}: "
+                  f"top-{PLATEAU_TOP_K} scores within {PLATEAU_TOLERANCE:.0%}")
+            break
+    evaluations.close()
     
     return best_config, best_score
 
+def tpe_search(threads, impl):
+    """Bayesian (TPE) search over the tile grid, resumable via data/autotune.db"""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    os.makedirs('data', exist_ok=True)
+    study = optuna.create_study(
+        direction='minimize',
+        sampler=optuna.samplers.TPESampler(n_startup_trials=TPE_STARTUP_TRIALS),
+        storage='sqlite:///data/autotune.db',
+        # Keyed on the binary and L2 budget so a rebuild or new --l2-kb starts a fresh study
+        study_name=f'{impl}_t{threads}_{_exe_hash()}_l2_{L2_KB_PER_CORE}kb',
+        load_if_exists=True,
+    )
+    
+    # A resumed study only runs the trials it has left
+    finished = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,
+                                                        optuna.trial.TrialState.PRUNED))
+    n_trials = max(0, TPE_TRIALS - len(finished))
+    if finished:
+        print(f"Resuming study with {len(finished)} finished trial(s), {n_trials} left")
+    
+    def completed():
+        return study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+    
+    def known_value(MB, NB, KB):
+        """Objective of an earlier completed trial with the same tiles, or None"""
+        params = {'MB': MB, 'NB': NB, 'KB': KB}
+        for t in completed():
+            if t.params == params:
+                return t.value
+        return None
+    
+    def plateaued():
+        # Like EARLY_STOP_MIN_FRACTION for the grid: never stop during the random startup trials
+        trials = completed()
+        if len(trials) < TPE_STARTUP_TRIALS:
+            return False
+        if is_plateau([-t.value for t in trials]):
+            print(f"Top-{PLATEAU_TOP_K} scores within {PLATEAU_TOLERANCE:.0%}, stopping search")
+            return True
+        return False
+    
+    # Ask for a batch of trials, benchmark them through iter_evaluations (concurrently
+    # when cores allow), then tell the results
+    batch_size = concurrent_slots(threads)
+    remaining = n_trials
+    while remaining > 0:
+        trials = [study.ask() for _ in range(min(batch_size, remaining))]
+        remaining -= len(trials)
+        pending = {}  # (MB, NB, KB) -> trials waiting on that config's benchmark
+        for trial in trials:
+            MB = trial.suggest_categorical('MB', MB_VALUES)
+            NB = trial.suggest_categorical('NB', NB_VALUES)
+            KB = trial.suggest_categorical('KB', KB_VALUES)
+            if not is_viable(MB, NB, KB, threads):
+                study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+                continue
+            value = known_value(MB, NB, KB)
+            if value is not None:
+                print(f"Trial {trial.number + 1}: MB={MB}, NB={NB}, KB={KB}")
+                print(f"  Already evaluated: {-value:.2f} GFLOP/s")
+                study.tell(trial, value)
+            else:
+                pending.setdefault((MB, NB, KB), []).append(trial)
+        
+        for (MB, NB, KB), scores in iter_evaluations(list(pending), threads, impl):
+            for trial in pending[(MB, NB, KB)]:
+                print(f"Trial {trial.number + 1}: MB={MB}, NB={NB}, KB={KB}")
+            value = -report_scores(scores)
+            for trial in pending[(MB, NB, KB)]:
+                study.tell(trial, value)
+        
+        if plateaued():
+            break
+    
+    if not completed():
+        return None, 0.0
+    best_score = -study.best_value
+    if best_score <= 0:
+        return None, 0.0
+    return dict(study.best_params), best_score
+
+def neighbors(MB, NB, KB):
+    """The config itself plus its +/-1-step neighbors along each axis of the grid"""
+    axes = (MB_VALUES, NB_VALUES, KB_VALUES)
+    center = [values.index(v) for values, v in zip(axes, (MB, NB, KB))]
+    ring = [(MB, NB, KB)]
+    for axis, values in enumerate(axes):
+        for step in (-1, 1):
+            idx = center[axis] + step
+            if 0 <= idx < len(values):
+                cfg = [MB, NB, KB]
+                cfg[axis] = values[idx]
+                ring.append(tuple(cfg))
+    return ring
+
+def local_search(threads, impl, seed_config):
+    """Hill-climb from seed_config one neighbor ring at a time.
+    
+    Returns (None, 0.0) if the seed itself fails, so the caller can fall back
+    to a full search.
+    """
+    seed = (seed_config['MB'], seed_config['NB'], seed_config['KB'])
+    results = {}
+    center = seed
+    while True:
+        ring = [cfg for cfg in neighbors(*center)
+                if cfg not in results and is_viable(*cfg, threads)]
+        print(f"Local search around MB={center[0]}, NB={center[1]}, KB={center[2]}: "
+              f"{len(ring)} new config(s)")
+        for (MB, NB, KB), scores in iter_evaluations(ring, threads, impl):
+            print(f"Tested config MB={MB}, NB={NB}, KB={KB}")
+            results[(MB, NB, KB)] = report_scores(scores)
+        
+        if results.get(seed, 0.0) <= 0:
+            return None, 0.0
+        best = max(results, key=results.get)
+        if best == center:
+            break
+        center = best
+    
+    print(f"Local search evaluated {len(results)} configs")
+    MB, NB, KB = center
+    return {'MB': MB, 'NB': NB, 'KB': KB}, results[center]
+
+def autotune_thread_count(threads, impl='mk_avx2', search='tpe', seed_config=None):
+    """Auto-tune tile sizes for a specific thread count, warm-starting from seed_config if given"""
+    print(f"\n=== Auto-tuning for {threads} threads ({search} search) ===")
+    
+    if seed_config:
+        config, score = local_search(threads, impl, seed_config)
+        if config:
+            return config, score
+        print("Seed config failed, falling back to full search")
+    
+    if search == 'tpe':
+        return tpe_search(threads, impl)
+    return grid_search(threads, impl)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Auto-tune GEMM tile sizes")
+    parser.add_argument('--search', choices=['tpe', 'grid'],
+                        default='tpe' if optuna is not None else 'grid',
+                        help="Search strategy: Bayesian TPE (requires optuna) or exhaustive grid")
+    parser.add_argument('--l2-kb', type=int, default=L2_KB_PER_CORE,
+                        help="Per-core L2 size in KB used to prune oversized tiles "
+                             "(e.g. 256 for Skylake client, 1280 for recent cores)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f"Always re-run benchmarks instead of reusing results from {CACHE_DB}")
+    parser.add_argument('--no-warm-start', action='store_true',
+                        help="Run the full search for every thread count instead of searching "
+                             "locally around the previous thread count's best config")
+    return parser.parse_args()
+
 def main():
     """Main auto-tuning function"""
+    global _use_cache, L2_KB_PER_CORE
+    args = parse_args()
+    _use_cache = not args.no_cache
+    L2_KB_PER_CORE = args.l2_kb
+    if args.search == 'tpe' and optuna is None:
+        print("Error: --search tpe requires optuna (pip install optuna)")
+        sys.exit(1)
+    
     print("GEMM Auto-Tuner - Finding optimal tile sizes")
     print("=" * 50)
     
     # Check if benchmark executable exists
-    if not os.path.exists('./gemm_bench.exe'):
+    if not os.path.exists(BENCH_EXE):
         print("Error: gemm_bench.exe not found. Please build first.")
         sys.exit(1)
     
-    # Thread counts to tune
+    # Thread counts to tune, ascending so each one seeds the next
     thread_counts = [1, 2, 4, 8]
+    driver_cpu = pin_driver(max(thread_counts))
+    if driver_cpu is not None:
+        print(f"Pinned autotuner to CPU {driver_cpu}")
     
     results = {}
+    seed_config = None
     
     for threads in thread_counts:
         try:
-            config, score = autotune_thread_count(threads)
+            config, score = autotune_thread_count(threads, search=args.search,
+                                                  seed_config=seed_config)
             if config:
                 results[f't{threads}'] = config
+                if not args.no_warm_start:
+                    seed_config = config
                 print(f"\nBest config for {threads} threads: {config} ({score:.2f} GFLOP/s)")
             else:
                 print(f"\nFailed to find good config for {threads} threads")
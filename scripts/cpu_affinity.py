@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+CPU affinity helpers shared by the benchmark drivers (autotune.py and
+run_comprehensive_benchmark.py).
+
+Benchmarks get their CPU set before exec where the OS allows it, so the
+OpenMP runtime never sees the driver's own one-CPU mask when it builds
+its place list.
+"""
+
+import multiprocessing
+import os
+import subprocess
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# psutil has no cpu_affinity on macOS, which has no affinity API at all
+_psutil_affinity = psutil is not None and hasattr(psutil.Process, 'cpu_affinity')
+
+# CPUs this process may use, captured before pin_driver narrows the mask
+if hasattr(os, 'sched_getaffinity'):
+    ALLOWED_CPUS = sorted(os.sched_getaffinity(0))
+else:
+    ALLOWED_CPUS = list(range(os.cpu_count() or 1))
+
+# OpenMP settings shared by every benchmark launch; built once at import
+BASE_ENV = {**os.environ, 'OMP_PLACES': 'cores', 'OMP_PROC_BIND': 'close'}
+
+# CPU the driver is pinned to, kept out of every benchmark's CPU set (see pin_driver)
+_driver_cpu = None
+
+# CPU set owned by this pool worker (see init_worker)
+_worker_cpus = None
+
+def _usable(cpus):
+    """cpus restricted to ALLOWED_CPUS, or all of them if none remain"""
+    usable = [cpu for cpu in cpus if cpu in ALLOWED_CPUS]
+    return usable or list(ALLOWED_CPUS)
+
+def pin_driver(max_threads):
+    """Pin this process to the last allowed CPU if the benchmarks never need it.
+
+    Returns that CPU, or None if the driver was left unpinned.
+    """
+    global _driver_cpu
+    if max_threads >= len(ALLOWED_CPUS):
+        return None
+    cpu = ALLOWED_CPUS[-1]
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, [cpu])
+    elif _psutil_affinity:
+        psutil.Process().cpu_affinity([cpu])
+    else:
+        return None
+    _driver_cpu = cpu
+    return cpu
+
+def free_cpu_count():
+    """Allowed CPUs left for benchmarks once the driver is pinned"""
+    return len(ALLOWED_CPUS) - (_driver_cpu is not None)
+
+def bench_cpus(threads, cpu_set=None):
+    """cpu_set, or the first threads allowed CPUs for an unpinned run"""
+    return list(cpu_set) if cpu_set else ALLOWED_CPUS[:threads]
+
+def bench_env(threads, cpu_set=None):
+    """Environment for a threads-wide benchmark, optionally placed on cpu_set"""
+    env = {**BASE_ENV, 'OMP_NUM_THREADS': str(threads)}
+    if cpu_set:
+        # One place per CPU, e.g. "{0},{1}", so concurrent benchmarks never share a core
+        env['OMP_PLACES'] = ','.join(f'{{{cpu}}}' for cpu in cpu_set)
+    return env
+
+def worker_slots(workers, threads):
+    """Queue of disjoint threads-wide CPU sets, one per pool worker (see init_worker)"""
+    cpu_slots = multiprocessing.Queue()
+    for i in range(workers):
+        cpu_slots.put(ALLOWED_CPUS[i * threads:(i + 1) * threads])
+    return cpu_slots
+
+def init_worker(cpu_slots):
+    """Pool initializer: claim a CPU set from cpu_slots for this worker's lifetime"""
+    global _worker_cpus
+    _worker_cpus = cpu_slots.get()
+
+def worker_cpus():
+    """CPU set claimed by init_worker, or None outside a pool worker"""
+    return _worker_cpus
+
+def popen_affinity_kwargs(cpus):
+    """Popen keyword arguments that set the child's affinity before exec (POSIX only)"""
+    if not hasattr(os, 'sched_setaffinity'):
+        return {}
+    cpus = _usable(cpus)
+    return {'preexec_fn': lambda: os.sched_setaffinity(0, cpus)}
+
+def pin_started(pid, cpus):
+    """Pin an already started process where pre-exec affinity is unavailable (Windows).
+
+    On Windows the process affinity mask covers all of its threads.
+    """
+    if hasattr(os, 'sched_setaffinity') or not _psutil_affinity:
+        return
+    try:
+        psutil.Process(pid).cpu_affinity(_usable(cpus))
+    except (psutil.Error, ValueError) as e:
+        print(f"Warning: could not pin benchmark to CPUs {cpus}: {e}")
+
+def pin_and_exec(cmd, env, cpus, timeout=None):
+    """Run cmd on cpus, returning (returncode, stdout, stderr).
+
+    Raises subprocess.TimeoutExpired after killing the process if it
+    outlives timeout.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, env=env, **popen_affinity_kwargs(cpus))
+    pin_started(proc.pid, cpus)
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise
+    return proc.returncode, stdout, stderr
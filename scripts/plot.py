@@ -4,9 +4,103 @@ import pathlib
 import sys
 import glob
 import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 from matplotlib.ticker import ScalarFormatter, FuncFormatter
 import os
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+INT_COLS = ['M', 'N', 'K', 'threads', 'MB', 'NB', 'KB']
+FLOAT_COLS = ['time_ms', 'gflops', 'relerr']
+NUMERIC_COLS = INT_COLS + FLOAT_COLS
+
+# Cells Arrow may cast to a number; anything else becomes null, like to_numeric(errors='coerce')
+_NUMBER_RE = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+def _to_number(column, target):
+    """Cast an Arrow column to target, turning empty or malformed cells into nulls"""
+    if pa.types.is_string(column.type):
+        column = pc.utf8_trim_whitespace(column)
+        column = pc.if_else(pc.match_substring_regex(column, _NUMBER_RE),
+                            column, pa.scalar(None, pa.string()))
+        column = column.cast(pa.float64())
+    if pa.types.is_integer(target) and pa.types.is_floating(column.type):
+        # Non-integral values cannot be held by an integer column
+        column = pc.if_else(pc.equal(pc.floor(column), column),
+                            column, pa.scalar(None, column.type))
+    return column.cast(target)
+
+def read_results_arrow(files):
+    """Read all CSVs with Arrow's multithreaded reader and concatenate before converting to pandas"""
+    tables = []
+    for file in files:
+        try:
+            table = pacsv.read_csv(file, read_options=pacsv.ReadOptions(use_threads=True))
+        except Exception as e:
+            print(f"Warning: Could not read {file}: {str(e)}")
+            continue
+        if table.num_rows == 0:
+            continue
+        
+        try:
+            # Normalize to one schema so prefixed ("impl=...") and clean files concatenate
+            columns = []
+            for name in table.column_names:
+                column = table[name]
+                prefix = f'{name}='
+                if pa.types.is_string(column.type):
+                    has_prefix = pc.starts_with(column, pattern=prefix)
+                    if pc.any(has_prefix).as_py():
+                        # Remove prefixes like "impl=", "M=", etc. only from cells that carry one
+                        column = pc.if_else(has_prefix,
+                                            pc.utf8_slice_codeunits(column, start=len(prefix)),
+                                            column)
+                if name in INT_COLS:
+                    column = _to_number(column, pa.int64())
+                elif name in FLOAT_COLS:
+                    column = _to_number(column, pa.float64())
+                columns.append(column)
+        except Exception as e:
+            print(f"Warning: Could not read {file}: {str(e)}")
+            continue
+        tables.append(pa.table(columns, names=table.column_names))
+        print(f"Read {table.num_rows} rows from {file}")
+    
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options='default').to_pandas()
+
+def read_results_pandas(files):
+    """Fallback reader used when pyarrow is not installed"""
+    dfs = []
+    for file in files:
+        try:
+            df = pd.read_csv(file)
+            if not df.empty:
+                # Clean the data format (remove prefixes like "impl=", "M=", etc.),
+                # touching only text columns whose values actually carry one
+                for col in df.select_dtypes(exclude='number').columns:
+                    prefix = f'{col}='
+                    mask = df[col].str.startswith(prefix, na=False)
+                    if mask.any():
+                        df.loc[mask, col] = df.loc[mask, col].str.slice(len(prefix))
+                
+                dfs.append(df)
+                print(f"Read {len(df)} rows from {file}")
+        except Exception as e:
+            print(f"Warning: Could not read {file}: {str(e)}")
+            continue
+    
+    if not dfs:
+        return None
+    return pd.concat(dfs, ignore_index=True)
+
 # Handle input files
 if len(sys.argv) < 2:
     input_files = ["results.csv"]  # Default file if none provided
@@ -28,34 +122,16 @@ base_name = pathlib.Path(input_files[0]).stem
 plot_file = out_dir / f"{base_name}_performance.png"
 
 # Read and concatenate all input files
-dfs = []
-for file in input_files:
-    try:
-        df = pd.read_csv(file)
-        if not df.empty:
-            # Clean the data format (remove column prefixes)
-            for col in df.columns:
-                if col in df.columns and df[col].dtype == 'object':
-                    # Remove prefixes like "impl=", "M=", etc.
-                    df[col] = df[col].astype(str).str.replace(f'{col}=', '', regex=False)
-            
-            # Convert numeric columns
-            numeric_cols = ['M', 'N', 'K', 'threads', 'MB', 'NB', 'KB', 'time_ms', 'gflops', 'relerr']
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            dfs.append(df)
-            print(f"Read {len(df)} rows from {file}")
-    except Exception as e:
-        print(f"Warning: Could not read {file}: {str(e)}")
-        continue
+df = read_results_arrow(input_files) if pa is not None else read_results_pandas(input_files)
 
-if not dfs:
+if df is None:
     print("Error: No valid data found in any input files")
     sys.exit(1)
-    
-df = pd.concat(dfs, ignore_index=True)
+
+# Convert numeric columns once on the combined frame
+for col in NUMERIC_COLS:
+    if col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
 print(f"Total rows: {len(df)}")
 
 # Clean and prepare data
@@ -66,33 +142,44 @@ df['impl_threads'] = df['impl'] + ' (' + df['threads'].astype(str) + 'T)'
 # Create a figure with two subplots: performance and relative error
 fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 14), gridspec_kw={'height_ratios': [3, 1]})
 
-# Get unique implementations and sort them for consistent colors
-impls = df['impl_threads'].unique()
-impls_sorted = sorted(impls, key=lambda x: ('naive' in x, 'blocked' in x, 'packed' in x, x))
+# Get unique implementations in a fixed display order for consistent colors
+IMPL_ORDER = ['mk_avx2', 'openblas', 'packed', 'blocked', 'naive']
+df['impl_base'] = pd.Categorical(df['impl'], categories=IMPL_ORDER, ordered=True)
+impls_sorted = df.sort_values(['impl_base', 'threads'])['impl_threads'].unique()
 colors = plt.cm.viridis(np.linspace(0, 0.8, len(impls_sorted)))
 
-# Plot performance (GFLOP/s)
+# Collect one line per implementation, then draw each subplot's lines as a single collection
+perf_segments, err_segments, line_colors, point_colors, legend_handles = [], [], [], [], []
 for impl, color in zip(impls_sorted, colors):
     sub_df = df[df['impl_threads'] == impl].sort_values('size')
     if not sub_df.empty:
-        ax1.plot(sub_df['size'], sub_df['gflops'], 
-                marker='o', markersize=6, linewidth=2,
-                label=impl, color=color)
-        
-        # Plot relative error on the second subplot
+        size = sub_df['size'].to_numpy(dtype=float)
         # Replace zeros with a small positive value for log scale
-        relerr = sub_df['relerr'].copy()
-        relerr[relerr == 0] = 1e-30
-        ax2.semilogx(sub_df['size'], relerr, 
-                    marker='o', markersize=4, linewidth=1,
-                    color=color, alpha=0.7)
+        relerr = np.where(sub_df['relerr'].to_numpy() == 0, 1e-30, sub_df['relerr'].to_numpy())
+        perf_segments.append(np.column_stack([size, sub_df['gflops'].to_numpy()]))
+        err_segments.append(np.column_stack([size, relerr]))
+        line_colors.append(color)
+        point_colors.extend([color] * len(size))
+        legend_handles.append(Line2D([], [], marker='o', markersize=6, linewidth=2,
+                                     color=color, label=impl))
+
+if perf_segments:
+    # Plot performance (GFLOP/s)
+    perf_points = np.concatenate(perf_segments)
+    ax1.add_collection(LineCollection(perf_segments, colors=line_colors, linewidths=2))
+    ax1.scatter(perf_points[:, 0], perf_points[:, 1], s=6**2, c=point_colors, zorder=3)
+    
+    # Plot relative error on the second subplot
+    err_points = np.concatenate(err_segments)
+    ax2.add_collection(LineCollection(err_segments, colors=line_colors, linewidths=1, alpha=0.7))
+    ax2.scatter(err_points[:, 0], err_points[:, 1], s=4**2, c=point_colors, alpha=0.7, zorder=3)
 
 # Customize the performance plot
 ax1.set_title('GEMM Performance (Higher is Better)', fontsize=14, pad=15)
 ax1.set_xscale('log')
 ax1.set_ylabel('GFLOP/s', fontsize=12)
 ax1.grid(True, which='both', linestyle='--', alpha=0.6)
-ax1.legend(loc='upper left', bbox_to_anchor=(1.02, 1), borderaxespad=0.)
+ax1.legend(handles=legend_handles, loc='upper left', bbox_to_anchor=(1.02, 1), borderaxespad=0.)
 ax1.tick_params(axis='both', which='major', labelsize=10)
 
 # Customize the error plot
@@ -169,12 +256,13 @@ def generate_milestone6_plots(df, out_dir):
         openblas_data = df_8t[df_8t['impl'] == 'openblas'].set_index('size')['gflops']
         
         for impl, color in zip(['naive', 'blocked', 'packed', 'mk_avx2'], colors[:-1]):
-            impl_data = df_8t[df_8t['impl'] == impl].copy()
+            impl_data = df_8t[df_8t['impl'] == impl]
             if not impl_data.empty:
-                impl_data['percent_of_openblas'] = impl_data.apply(
-                    lambda row: (row['gflops'] / openblas_data.get(row['size'], 1)) * 100 
-                    if row['size'] in openblas_data.index else 0, axis=1
-                )
+                # Align on size in one join; sizes without an OpenBLAS run plot as 0%
+                impl_data = impl_data.merge(openblas_data.rename('ob_gflops'),
+                                            left_on='size', right_index=True, how='left')
+                percent = impl_data['gflops'].to_numpy() / impl_data['ob_gflops'].to_numpy() * 100.0
+                impl_data['percent_of_openblas'] = np.nan_to_num(percent, nan=0.0)
                 impl_data = impl_data.sort_values('size')
                 ax.plot(impl_data['size'], impl_data['percent_of_openblas'],
                        marker='o', linewidth=2, markersize=6,
@@ -8,9 +8,17 @@ import subprocess
 import os
 import sys
 import json
+from functools import lru_cache
 import matplotlib.pyplot as plt
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; the NumPy version below is already vectorized
+    def njit(*args, **kwargs):
+        return lambda func: func
+
 def measure_memory_bandwidth():
     """Measure peak memory bandwidth using a simple stream benchmark"""
     print("Measuring memory bandwidth...")
@@ -19,42 +27,60 @@ def measure_memory_bandwidth():
     bandwidth_test = """
 #include <chrono>
 #include <iostream>
-#include <vector>
-#include <algorithm>
+#include <immintrin.h>
+#include <malloc.h>
+
+// STREAM-style add kernel: AVX2 loads + non-temporal stores, so C is written
+// without a read-for-ownership and does not evict A/B from the cache
+static void add_stream(const float* a, const float* b, float* c, size_t n) {
+    for (size_t i = 0; i < n; i += 8) {
+        __m256 va = _mm256_load_ps(&a[i]);
+        __m256 vb = _mm256_load_ps(&b[i]);
+        _mm256_stream_ps(&c[i], _mm256_add_ps(va, vb));
+    }
+    _mm_sfence();
+}
 
 int main() {
-    const size_t N = 64 * 1024 * 1024;  // 64M floats = 256MB
+    const size_t N = 64 * 1024 * 1024;  // 64M floats = 256MB (multiple of 8)
     const int reps = 10;
     
-    std::vector<float> a(N), b(N), c(N);
+    float* a = static_cast<float*>(_aligned_malloc(N * sizeof(float), 64));
+    float* b = static_cast<float*>(_aligned_malloc(N * sizeof(float), 64));
+    float* c = static_cast<float*>(_aligned_malloc(N * sizeof(float), 64));
+    if (!a || !b || !c) {
+        std::cerr << "Allocation failed" << std::endl;
+        return 1;
+    }
     
     // Initialize
-    std::fill(a.begin(), a.end(), 1.0f);
-    std::fill(b.begin(), b.end(), 2.0f);
+    for (size_t i = 0; i < N; ++i) {
+        a[i] = 1.0f;
+        b[i] = 2.0f;
+    }
     
     // Warmup
-    for (int i = 0; i < N; ++i) {
-        c[i] = a[i] + b[i];
-    }
+    add_stream(a, b, c, N);
     
     // Timed runs
     auto start = std::chrono::steady_clock::now();
     
     for (int rep = 0; rep < reps; ++rep) {
-        for (int i = 0; i < N; ++i) {
-            c[i] = a[i] + b[i];  // 2 reads + 1 write = 12 bytes per iteration
-        }
+        add_stream(a, b, c, N);  // 2 reads + 1 streaming write = 12 bytes per element
     }
     
     auto end = std::chrono::steady_clock::now();
     auto duration = std::chrono::duration_cast<std::chrono::nanoseconds>(end - start);
     
     double time_s = duration.count() / 1e9;
-    double bytes = N * 12.0 * reps;  // 12 bytes per element per rep
+    double bytes = N * 12.0 * reps;  // 12 bytes per element per rep (no RFO traffic)
     double bandwidth_gb_s = bytes / (time_s * 1e9);
     
     std::cout << "Memory bandwidth: " << bandwidth_gb_s << " GB/s" << std::endl;
     
+    _aligned_free(a);
+    _aligned_free(b);
+    _aligned_free(c);
     return 0;
 }
 """
@@ -65,7 +91,7 @@ int main() {
     
     try:
         # Compile
-        subprocess.run(['cl', '/O2', '/EHsc', 'bandwidth_test.cpp', '/Fe:bandwidth_test.exe'], 
+        subprocess.run(['cl', '/O2', '/arch:AVX2', '/EHsc', 'bandwidth_test.cpp', '/Fe:bandwidth_test.exe'], 
                       check=True, capture_output=True)
         
         # Run
@@ -108,20 +134,30 @@ def estimate_peak_compute():
     print(f"Estimated peak: {peak_gflops} GFLOP/s")
     return peak_gflops
 
-def calculate_operational_intensity(MB, NB, KB):
-    """Calculate operational intensity for a GEMM tile"""
+@njit(cache=True)
+def oi_batch(MBs, NBs, KBs):
+    """Operational intensity, FLOPs and bytes for arrays of GEMM tile sizes"""
+    mb = MBs.astype(np.float64)
+    nb = NBs.astype(np.float64)
+    kb = KBs.astype(np.float64)
     # FLOPs = 2 * MB * NB * KB (multiply-add for each element)
-    flops = 2 * MB * NB * KB
+    flops = 2.0 * mb * nb * kb
     
     # Bytes transferred (assuming optimal case):
     # - A panel: MB * KB * 4 bytes (read once)
     # - B panel: KB * NB * 4 bytes (read once)  
     # - C tile: MB * NB * 4 bytes (read once, write once)
-    bytes_transferred = 4 * (MB * KB + KB * NB + 2 * MB * NB)
+    bytes_transferred = 4.0 * (mb * kb + kb * nb + 2.0 * mb * nb)
     
     oi = flops / bytes_transferred
     return oi, flops, bytes_transferred
 
+@lru_cache(maxsize=None)
+def calculate_operational_intensity(MB, NB, KB):
+    """Calculate operational intensity for a GEMM tile (single-tile oi_batch)"""
+    ois, flops, bytes_transferred = oi_batch(np.array([MB]), np.array([NB]), np.array([KB]))
+    return float(ois[0]), int(flops[0]), int(bytes_transferred[0])
+
 def create_roofline_plot():
     """Create roofline plot with our GEMM results"""
     print("Creating roofline plot...")
@@ -159,8 +195,10 @@ def create_roofline_plot():
     
     # Plot our tile configurations
     colors = ['red', 'blue', 'green']
+    MBs, NBs, KBs = (np.array(dim) for dim in list(zip(*tile_configs))[:3])
+    ois, _, _ = oi_batch(MBs, NBs, KBs)
     for i, (MB, NB, KB, label) in enumerate(tile_configs):
-        oi, flops, bytes_transferred = calculate_operational_intensity(MB, NB, KB)
+        oi = ois[i]
         
         # Estimate performance (this would come from actual measurements)
         # For now, use our best measured performance
@@ -5,20 +5,26 @@ Tests all implementations across multiple sizes and generates comparison data.
 """
 
 import subprocess
+import json
+import multiprocessing
 import os
 import sys
-import csv
 import time
+import pandas as pd
 from datetime import datetime
 
-def run_single_benchmark(impl, N, MB=256, NB=256, KB=256, threads=8, reps=3):
-    """Run a single benchmark configuration"""
+from cpu_affinity import (bench_cpus, bench_env, free_cpu_count, init_worker, pin_and_exec,
+                          pin_driver, worker_cpus, worker_slots)
+
+# Upper bound on concurrent benchmarks when a thread count leaves cores idle
+MAX_WORKERS = 4
+
+# Skip a naive run when scaling its last measured time by (N / prev_N)^3 exceeds this
+MAX_PREDICTED_MS = 60_000
+
+def run_single_benchmark(impl, N, MB=256, NB=256, KB=256, threads=8, reps=3, cpu_set=None):
+    """Run a single benchmark configuration, optionally pinned to the logical CPUs in cpu_set"""
     try:
-        env = os.environ.copy()
-        env['OMP_NUM_THREADS'] = str(threads)
-        env['OMP_PLACES'] = 'cores'
-        env['OMP_PROC_BIND'] = 'close'
-        
         cmd = [
             './gemm_bench.exe',
             '--impl', impl,
@@ -26,38 +32,22 @@ def run_single_benchmark(impl, N, MB=256, NB=256, KB=256, threads=8, reps=3):
             '--MB', str(MB),
             '--NB', str(NB),
             '--KB', str(KB),
-            '--reps', str(reps)
+            '--reps', str(reps),
+            '--format', 'json'
         ]
         
         print(f"Running: {impl} N={N} threads={threads}")
-        result = subprocess.run(cmd, capture_output=True, text=True, env=env, timeout=300)
+        returncode, stdout, stderr = pin_and_exec(cmd, bench_env(threads, cpu_set),
+                                                  bench_cpus(threads, cpu_set), timeout=300)
         
-        if result.returncode != 0:
-            print(f"  Error: {result.stderr}")
+        if returncode != 0:
+            print(f"  Error: {stderr}")
             return None
             
-        # Parse results from output
-        lines = result.stdout.split('\n')
-        for line in lines:
-            if line.startswith('impl='):
-                # Parse the result line
-                parts = line.split(',')
-                data = {}
-                for part in parts:
-                    if '=' in part:
-                        key, value = part.split('=', 1)
-                        data[key] = value
-                
-                # Convert numeric fields
-                numeric_fields = ['M', 'N', 'K', 'threads', 'MB', 'NB', 'KB', 'time_ms', 'gflops', 'relerr']
-                for field in numeric_fields:
-                    if field in data:
-                        try:
-                            data[field] = float(data[field])
-                        except ValueError:
-                            pass
-                
-                return data
+        # Parse the JSON result line (numeric fields arrive typed)
+        for line in stdout.splitlines():
+            if line.startswith('{'):
+                return json.loads(line)
         
         return None
         
@@ -68,6 +58,29 @@ def run_single_benchmark(impl, N, MB=256, NB=256, KB=256, threads=8, reps=3):
         print(f"  Exception: {e}")
         return None
 
+def _run_one(job):
+    impl, N, threads = job
+    return job, run_single_benchmark(impl, N, threads=threads, reps=2, cpu_set=worker_cpus())
+
+def run_jobs(jobs, threads):
+    """Yield (job, result) for (impl, N, threads) jobs sharing one thread count.
+    
+    If several benchmarks fit on the machine side by side, they run in a
+    process pool with each worker pinned to its own CPU set; otherwise
+    they run one after another.
+    """
+    workers = min(MAX_WORKERS, free_cpu_count() // threads)
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            impl, N, _ = job
+            yield job, run_single_benchmark(impl, N, threads=threads, reps=2)
+        return
+    
+    print(f"Running {threads}-thread benchmarks {workers} at a time")
+    with multiprocessing.Pool(processes=workers, initializer=init_worker,
+                              initargs=(worker_slots(workers, threads),)) as pool:
+        yield from pool.imap_unordered(_run_one, jobs)
+
 def main():
     """Run comprehensive benchmarks"""
     print("Comprehensive GEMM Benchmark Suite")
@@ -82,6 +95,9 @@ def main():
     implementations = ['naive', 'blocked', 'packed', 'mk_avx2']
     sizes = [256, 512, 1024, 1536, 2048, 3072, 4096]
     thread_counts = [1, 8]  # Test single-threaded and multi-threaded
+    driver_cpu = pin_driver(max(thread_counts))
+    if driver_cpu is not None:
+        print(f"Pinned benchmark driver to CPU {driver_cpu}")
     
     # Results storage
     results = []
@@ -96,31 +112,37 @@ def main():
     print(f"Running {total_tests} benchmark configurations...")
     print(f"Results will be saved to: {output_file}")
     
-    for impl in implementations:
+    # Run each thread count in waves of ascending N, so a slow implementation's
+    # time at one size predicts whether the next size is worth running
+    last_time = {}  # (impl, threads) -> (N, time_ms) of the largest completed run
+    for threads in thread_counts:
         for N in sizes:
-            for threads in thread_counts:
+            jobs = []
+            for impl in implementations:
+                prev = last_time.get((impl, threads))
+                if impl == 'naive' and prev:
+                    prev_N, prev_ms = prev
+                    predicted_ms = prev_ms * (N / prev_N) ** 3
+                    if predicted_ms > MAX_PREDICTED_MS:
+                        test_count += 1
+                        print(f"Skipping {impl} N={N} threads={threads} "
+                              f"(predicted {predicted_ms / 1000:.0f} s from N={prev_N})")
+                        continue
+                jobs.append((impl, N, threads))
+            
+            for (impl, _, _), result in run_jobs(jobs, threads):
                 test_count += 1
-                print(f"\n[{test_count}/{total_tests}] Testing {impl} N={N} threads={threads}")
-                
-                # Skip naive for large sizes with multiple threads (too slow)
-                if impl == 'naive' and N >= 2048 and threads > 1:
-                    print("  Skipping (too slow)")
-                    continue
-                
-                # Skip naive for very large sizes even single-threaded
-                if impl == 'naive' and N >= 4096:
-                    print("  Skipping (too slow)")
-                    continue
-                
-                # Run benchmark
-                result = run_single_benchmark(impl, N, threads=threads, reps=2)
-                
+                print(f"\n[{test_count}/{total_tests}] {impl} N={N} threads={threads}")
                 if result:
                     results.append(result)
+                    last_time[(impl, threads)] = (N, result['time_ms'])
                     print(f"  Result: {result['gflops']:.2f} GFLOP/s, {result['time_ms']:.2f} ms")
                 else:
                     print("  Failed")
     
+    # Keep the CSV in a stable impl/size/thread order regardless of completion order
+    results.sort(key=lambda r: (implementations.index(r['impl']), r['N'], r['threads']))
+    
     # Save results to CSV
     if results:
         print(f"\nSaving {len(results)} results to {output_file}")
@@ -128,14 +150,8 @@ def main():
         fieldnames = ['impl', 'M', 'N', 'K', 'threads', 'MB', 'NB', 'KB', 
                      'time_ms', 'gflops', 'relerr', 'notes']
         
-        with open(output_file, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for result in results:
-                # Ensure all required fields are present
-                row = {field: result.get(field, '') for field in fieldnames}
-                writer.writerow(row)
+        # Single bulk write; reindex fills any missing field with an empty cell
+        pd.DataFrame(results).reindex(columns=fieldnames).to_csv(output_file, index=False)
         
         print(f"Results saved to {output_file}")
         
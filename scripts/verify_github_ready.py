@@ -3,139 +3,280 @@
 Verification script to ensure repository is ready for GitHub
 """
 
-import pathlib
+import argparse
+import contextlib
+import functools
+import os
 import json
+import re
+import subprocess
 import sys
 
+# Status prefixes for report lines
+OK = "✅ "
+FAIL = "❌ "
+WARN = "⚠️  "
+
+# Report lines, written to stdout in one go when main() finishes
+_out = []
+
+def emit(line):
+    """Queue one line of the report"""
+    _out.append(line)
+
+# Build artifacts and Python cache files
+BAD_SUFFIXES = ('.obj', '.exe', '.pdb', '.ilk', '.pyc')  # tuple, for str.endswith
+# Build output and Python cache directories
+BAD_DIRS = frozenset({'build', 'out', 'Debug', 'Release', '__pycache__'})
+# Large result files
+BAD_PATHS = frozenset({'data/runs'})
+
+# `git check-ignore -v` prefix "<source>:<line>:<pattern>"; unmatched paths get "::"
+_IGNORE_MATCH_RE = re.compile(r'.*?:\d+:(.*)')
+
+@contextlib.contextmanager
+def _git_ignored():
+    """Yield ignored(path), answered by one long-lived `git check-ignore --stdin`.
+    
+    Without git, or outside a work tree, nothing counts as ignored.
+    """
+    try:
+        proc = subprocess.Popen(['git', 'check-ignore', '--stdin', '--verbose', '--non-matching'],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True,
+                                env={**os.environ, 'GIT_FLUSH': '1'})
+    except OSError:
+        yield lambda path: False
+        return
+    
+    def ignored(path):
+        try:
+            proc.stdin.write(path + '\n')
+            proc.stdin.flush()
+        except OSError:
+            return False
+        # One line back per path; EOF means git gave up (e.g. not a repository)
+        info = proc.stdout.readline().partition('\t')[0]
+        match = _IGNORE_MATCH_RE.match(info)
+        return match is not None and not match.group(1).startswith('!')
+    
+    try:
+        yield ignored
+    finally:
+        with contextlib.suppress(OSError):
+            proc.stdin.close()
+        proc.stdout.close()
+        proc.wait()
+
+@functools.lru_cache(maxsize=None)
+def _scan_repo():
+    """Index the repository in one scandir pass.
+    
+    Returns (index, scanned, unwanted): index maps relative path -> os.DirEntry,
+    scanned holds the directories that were read, and unwanted lists build
+    artifacts and result dirs that .gitignore does not cover. Entry types come
+    from the directory listing itself, so no entry is stat'ed. .git, git-ignored
+    and unwanted directories are indexed but not descended into.
+    """
+    index = {}
+    scanned = set()
+    unwanted = []
+    pending = ['.']
+    with _git_ignored() as ignored:
+        while pending:
+            top = pending.pop()
+            # top is '.' or './dir'; relative paths drop the './'
+            scanned.add(top[2:].replace(os.sep, '/'))
+            with os.scandir(top) as it:
+                for entry in it:
+                    rel = entry.path[2:].replace(os.sep, '/')
+                    index[rel] = entry
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name == '.git' or ignored(rel + '/'):
+                            continue
+                        if entry.name in BAD_DIRS or rel in BAD_PATHS:
+                            unwanted.append(rel + '/')
+                        else:
+                            pending.append(entry.path)
+                    elif entry.name.endswith(BAD_SUFFIXES) and not ignored(rel):
+                        unwanted.append(rel)
+    return index, scanned, sorted(unwanted)
+
+def _lookup(path):
+    """DirEntry for path, or None if it does not exist.
+    
+    Symlinks are followed like os.path.exists(), so a dangling link is
+    missing wherever it sits. Paths under directories the index skips are
+    answered by reading their parent directory.
+    """
+    index, scanned, _ = _scan_repo()
+    entry = index.get(path)
+    parent, _, name = path.rpartition('/')
+    if entry is None and parent not in scanned:
+        try:
+            with os.scandir(parent) as it:
+                entry = next((e for e in it if e.name == name), None)
+        except OSError:
+            entry = None
+    if entry is not None and entry.is_symlink() and not os.path.exists(entry.path):
+        return None
+    return entry
+
+def find_unwanted(limit=6):
+    """First limit unwanted paths not already covered by .gitignore"""
+    return _scan_repo()[2][:limit]
+
 def check_file_exists(path, description):
     """Check if a file exists and report status"""
-    if pathlib.Path(path).exists():
-        print(f"✅ {description}: {path}")
+    if _lookup(path) is not None:
+        emit(f"{OK}{description}: {path}")
         return True
     else:
-        print(f"❌ {description}: {path} - MISSING")
+        emit(f"{FAIL}{description}: {path} - MISSING")
         return False
 
 def check_directory_exists(path, description):
     """Check if a directory exists and report status"""
-    if pathlib.Path(path).is_dir():
-        print(f"✅ {description}: {path}/")
+    entry = _lookup(path)
+    if entry is not None and entry.is_dir():
+        emit(f"{OK}{description}: {path}/")
         return True
     else:
-        print(f"❌ {description}: {path}/ - MISSING")
+        emit(f"{FAIL}{description}: {path}/ - MISSING")
         return False
 
 def check_file_size(path, max_size_kb, description):
     """Check if file is under size limit"""
-    file_path = pathlib.Path(path)
-    if file_path.exists():
-        size_kb = file_path.stat().st_size / 1024
+    entry = _lookup(path)
+    if entry is not None:
+        # The only check that needs a stat; follows symlinks like os.stat()
+        size_kb = entry.stat().st_size / 1024
         if size_kb <= max_size_kb:
-            print(f"✅ {description}: {path} ({size_kb:.1f} KB)")
+            emit(f"{OK}{description}: {path} ({size_kb:.1f} KB)")
             return True
         else:
-            print(f"⚠️  {description}: {path} ({size_kb:.1f} KB > {max_size_kb} KB)")
+            emit(f"{WARN}{description}: {path} ({size_kb:.1f} KB > {max_size_kb} KB)")
             return False
     else:
-        print(f"❌ {description}: {path} - MISSING")
+        emit(f"{FAIL}{description}: {path} - MISSING")
         return False
 
-def main():
-    print("🔍 GitHub Repository Readiness Check")
-    print("=" * 40)
+# Required for the repository to be usable at all; the first failure ends the run
+CRITICAL_CHECKS = [
+    ("📁 Core Files:", [
+        (check_file_exists, "README.md", "Main README"),
+        (check_file_exists, "LICENSE", "License file"),
+        (check_file_exists, "CMakeLists.txt", "CMake build file"),
+        (check_file_exists, ".gitignore", "Git ignore file"),
+        (check_file_exists, "CONTRIBUTING.md", "Contributing guide"),
+    ]),
+    ("💻 Source Code:", [
+        (check_directory_exists, "cpu", "CPU implementations"),
+        (check_directory_exists, "include", "Header files"),
+        (check_directory_exists, "bench", "Benchmark harness"),
+        (check_directory_exists, "tests", "Test suite"),
+        (check_directory_exists, "baselines", "Baseline implementations"),
+    ]),
+    ("🔧 Scripts:", [
+        (check_file_exists, "scripts/bench.ps1", "Windows benchmark script"),
+        (check_file_exists, "scripts/bench.sh", "Linux/macOS benchmark script"),
+        (check_file_exists, "scripts/plot.py", "Plotting script"),
+        (check_file_exists, "scripts/verify_plots.py", "Plot verification"),
+    ]),
+    ("📚 Documentation:", [
+        (check_directory_exists, "docs", "Documentation directory"),
+        (check_file_exists, "docs/BUILD_INSTRUCTIONS.md", "Build instructions"),
+        (check_file_exists, "docs/ARCHITECTURE.md", "Architecture docs"),
+        (check_file_exists, "docs/PERFORMANCE_RESULTS.md", "Performance analysis"),
+    ]),
+]
+
+# Polish checks, only reached once every critical check has passed (or with --full)
+COSMETIC_CHECKS = [
+    ("📊 Data Files:", [
+        (check_file_size, "data/best_tiles.json", 5, "Tile configurations"),
+        (check_file_size, "data/example_results.csv", 2, "Example results"),
+    ]),
+    ("🖼️  Showcase Assets:", [
+        (check_file_exists, "results/plots/gemm_gflops_vs_N.png", "Hero plot"),
+    ]),
+    ("🔄 CI/CD:", [
+        (check_file_exists, ".github/workflows/ci.yml", "GitHub Actions"),
+    ]),
+    ("🛠️  Development Tools:", [
+        (check_file_exists, ".clang-format", "Code formatting"),
+        (check_file_exists, ".editorconfig", "Editor config"),
+        (check_file_exists, ".vscode/settings.json", "VS Code settings"),
+    ]),
+]
+
+def run_checks(full=False):
+    emit("🔍 GitHub Repository Readiness Check")
+    emit("=" * 40)
     
     all_good = True
     
-    # Core files
-    print("\n📁 Core Files:")
-    all_good &= check_file_exists("README.md", "Main README")
-    all_good &= check_file_exists("LICENSE", "License file")
-    all_good &= check_file_exists("CMakeLists.txt", "CMake build file")
-    all_good &= check_file_exists(".gitignore", "Git ignore file")
-    all_good &= check_file_exists("CONTRIBUTING.md", "Contributing guide")
-    
-    # Source code
-    print("\n💻 Source Code:")
-    all_good &= check_directory_exists("cpu", "CPU implementations")
-    all_good &= check_directory_exists("include", "Header files")
-    all_good &= check_directory_exists("bench", "Benchmark harness")
-    all_good &= check_directory_exists("tests", "Test suite")
-    all_good &= check_directory_exists("baselines", "Baseline implementations")
-    
-    # Scripts
-    print("\n🔧 Scripts:")
-    all_good &= check_file_exists("scripts/bench.ps1", "Windows benchmark script")
-    all_good &= check_file_exists("scripts/bench.sh", "Linux/macOS benchmark script")
-    all_good &= check_file_exists("scripts/plot.py", "Plotting script")
-    all_good &= check_file_exists("scripts/verify_plots.py", "Plot verification")
-    
-    # Documentation
-    print("\n📚 Documentation:")
-    all_good &= check_directory_exists("docs", "Documentation directory")
-    all_good &= check_file_exists("docs/BUILD_INSTRUCTIONS.md", "Build instructions")
-    all_good &= check_file_exists("docs/ARCHITECTURE.md", "Architecture docs")
-    all_good &= check_file_exists("docs/PERFORMANCE_RESULTS.md", "Performance analysis")
+    for title, checks in CRITICAL_CHECKS:
+        emit(f"\n{title}")
+        for check, *args in checks:
+            if not check(*args):
+                all_good = False
+                if not full:
+                    emit("\n" + "=" * 40)
+                    emit(f"{FAIL}REPOSITORY NOT READY")
+                    emit("Critical check failed; skipping remaining checks (use --full to run all)")
+                    return False
     
-    # Data files (small)
-    print("\n📊 Data Files:")
-    all_good &= check_file_size("data/best_tiles.json", 5, "Tile configurations")
-    all_good &= check_file_size("data/example_results.csv", 2, "Example results")
-    
-    # Hero plot
-    print("\n🖼️  Showcase Assets:")
-    all_good &= check_file_exists("results/plots/gemm_gflops_vs_N.png", "Hero plot")
-    
-    # CI/CD
-    print("\n🔄 CI/CD:")
-    all_good &= check_file_exists(".github/workflows/ci.yml", "GitHub Actions")
-    
-    # Development tools
-    print("\n🛠️  Development Tools:")
-    all_good &= check_file_exists(".clang-format", "Code formatting")
-    all_good &= check_file_exists(".editorconfig", "Editor config")
-    all_good &= check_file_exists(".vscode/settings.json", "VS Code settings")
+    for title, checks in COSMETIC_CHECKS:
+        emit(f"\n{title}")
+        for check, *args in checks:
+            all_good &= check(*args)
     
     # Check for files that shouldn't be there
-    print("\n🚫 Unwanted Files Check:")
-    unwanted_patterns = [
-        "*.obj", "*.exe", "*.pdb", "*.ilk",  # Build artifacts
-        "build/", "out/", "Debug/", "Release/",  # Build directories
-        "data/runs/",  # Large result files
-        "__pycache__/", "*.pyc",  # Python cache
-    ]
-    
-    unwanted_found = []
-    for pattern in unwanted_patterns:
-        matches = list(pathlib.Path(".").glob(pattern))
-        if matches:
-            unwanted_found.extend(matches)
+    emit("\n🚫 Unwanted Files Check:")
+    unwanted_found = find_unwanted()
     
     if unwanted_found:
-        print("⚠️  Found unwanted files (should be in .gitignore):")
+        emit(f"{WARN}Found unwanted files (should be in .gitignore):")
         for file in unwanted_found[:5]:  # Show first 5
-            print(f"   - {file}")
+            emit(f"   - {file}")
         if len(unwanted_found) > 5:
-            print(f"   ... and {len(unwanted_found) - 5} more")
+            emit("   ... and possibly more")
     else:
-        print("✅ No unwanted files found")
+        emit(f"{OK}No unwanted files found")
     
     # Final status
-    print("\n" + "=" * 40)
+    emit("\n" + "=" * 40)
     if all_good and not unwanted_found:
-        print("🎉 REPOSITORY IS READY FOR GITHUB!")
-        print("✅ All required files present")
-        print("✅ No unwanted files detected")
-        print("✅ File sizes appropriate")
-        print("\n🚀 Ready to push with:")
-        print("   git add .")
-        print("   git commit -m 'High-performance GEMM: 360.39 GFLOP/s'")
-        print("   git push origin main")
+        emit("🎉 REPOSITORY IS READY FOR GITHUB!")
+        emit(f"{OK}All required files present")
+        emit(f"{OK}No unwanted files detected")
+        emit(f"{OK}File sizes appropriate")
+        emit("\n🚀 Ready to push with:")
+        emit("   git add .")
+        emit("   git commit -m 'High-performance GEMM: 360.39 GFLOP/s'")
+        emit("   git push origin main")
         return True
     else:
-        print("❌ REPOSITORY NOT READY")
-        print("Please fix the issues above before pushing to GitHub")
+        emit(f"{FAIL}REPOSITORY NOT READY")
+        emit("Please fix the issues above before pushing to GitHub")
         return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check that the repository is ready for GitHub")
+    parser.add_argument('--full', action='store_true',
+                        help="Run every check even after a critical one fails")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    try:
+        return run_checks(full=args.full)
+    finally:
+        # One write for the whole report instead of one per line
+        sys.stdout.write("\n".join(_out) + "\n")
+        _out.clear()
+
 if __name__ == "__main__":
     success = main()
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -3,40 +3,105 @@
 Quick verification script to check if plots contain data
 """
 
+import argparse
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import pathlib
+import os
+import re
 import sys
 
+# Where the verification plot is written
+RESULTS_PLOTS = "results/plots"
+
+# Column types applied while parsing, so no post-pass conversion is needed
+CSV_DTYPES = {
+    'impl': 'category',
+    'M': 'Int32', 'N': 'Int32', 'K': 'Int32', 'threads': 'Int16',
+    'MB': 'Int32', 'NB': 'Int32', 'KB': 'Int32',
+    'time_ms': 'float32', 'gflops': 'float32', 'relerr': 'float32',
+}
+
+# Leading 'colname=' on a cell; anchored so '=' inside a plain value is left alone
+_PREFIX_RE = re.compile(r'^[A-Za-z_]+=')
+
+def _strip_prefix(value):
+    """'gflops=2.97' -> '2.97'; values without a prefix pass through"""
+    return _PREFIX_RE.sub('', value)
+
+def _read_header(csv_file):
+    """Column names from the first line of csv_file"""
+    with open(csv_file, encoding='utf-8-sig') as f:
+        return f.readline().rstrip('\r\n').split(',')
+
+def _read_csv(csv_file, **kwargs):
+    """pd.read_csv straight from a memory map of the file.
+    
+    Mapping only saves a copy for local files; where it fails (some network
+    filesystems) this falls back to ordinary buffered reads.
+    """
+    try:
+        return pd.read_csv(csv_file, engine='c', memory_map=True, low_memory=False, **kwargs)
+    except OSError:
+        return pd.read_csv(csv_file, engine='c', low_memory=False, **kwargs)
+
+def read_results(csv_file, usecols=None):
+    """Read a results CSV with typed columns, stripping 'col=' prefixes inside the parser.
+    
+    If usecols is given, only those columns are parsed.
+    """
+    columns = _read_header(csv_file)
+    if usecols is not None:
+        columns = [col for col in columns if col in usecols]
+    dtypes = {col: dtype for col, dtype in CSV_DTYPES.items() if col in columns}
+    numeric = {col: dtype for col, dtype in dtypes.items() if dtype != 'category'}
+    # Converters and dtype= are exclusive per column: string columns are always
+    # stripped, numeric ones are parsed typed and only stripped if that fails
+    strip = {col: _strip_prefix for col in columns if col not in numeric}
+    try:
+        df = _read_csv(csv_file, usecols=columns, dtype=numeric, converters=strip)
+    except (ValueError, TypeError):
+        # A prefixed or malformed numeric cell in some row; strip every column
+        # and let _coerce turn whatever still does not parse into NA
+        df = _read_csv(csv_file, usecols=columns,
+                       converters={col: _strip_prefix for col in columns})
+        return _coerce(df, dtypes)
+    return _coerce(df, {col: dtype for col, dtype in dtypes.items() if col not in numeric})
+
+def _coerce(df, dtypes):
+    """Cast columns to dtypes, turning empty or malformed numeric cells into NA"""
+    for col, dtype in dtypes.items():
+        if dtype == 'category':
+            df[col] = df[col].astype(dtype)
+            continue
+        values = pd.to_numeric(df[col], errors='coerce')
+        if dtype.startswith('Int'):
+            # Non-integral values cannot be held by an integer column
+            values = values.where(values % 1 == 0)
+        df[col] = values.astype(dtype)
+    return df
+
+# The only columns the summary and the verification plot look at
+VERIFY_COLS = ['impl', 'M', 'N', 'threads', 'gflops']
+
 def verify_csv_data(csv_file):
-    """Verify CSV data can be read and processed"""
+    """Verify CSV data can be read and processed (only VERIFY_COLS are loaded)"""
     print(f"Verifying CSV data: {csv_file}")
     
     try:
-        df = pd.read_csv(csv_file)
+        df = read_results(csv_file, usecols=VERIFY_COLS)
         print(f"✓ Read {len(df)} rows")
         
-        # Clean the data format (remove column prefixes)
-        for col in df.columns:
-            if col in df.columns and df[col].dtype == 'object':
-                df[col] = df[col].astype(str).str.replace(f'{col}=', '', regex=False)
-        
-        # Convert numeric columns
-        numeric_cols = ['M', 'N', 'K', 'threads', 'MB', 'NB', 'KB', 'time_ms', 'gflops', 'relerr']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
         print(f"✓ Data cleaned successfully")
-        print(f"✓ Implementations found: {df['impl'].unique()}")
-        print(f"✓ Matrix sizes: {sorted(df['N'].unique())}")
+        # impl is categorical, so its distinct values are just the category index
+        print(f"✓ Implementations found: {', '.join(df['impl'].cat.categories)}")
+        print(f"✓ Matrix sizes: {sorted(df['N'].dropna().unique())}")
         print(f"✓ GFLOP/s range: {df['gflops'].min():.2f} - {df['gflops'].max():.2f}")
         
         # Show top performers
         top_results = df.nlargest(3, 'gflops')[['impl', 'N', 'threads', 'gflops']]
         print("\n🏆 Top 3 Results:")
-        for _, row in top_results.iterrows():
-            print(f"   {row['impl']} N={row['N']} ({row['threads']}T): {row['gflops']:.2f} GFLOP/s")
+        for impl, N, threads, gflops in top_results.itertuples(index=False, name=None):
+            print(f"   {impl} N={N} ({threads}T): {gflops:.2f} GFLOP/s")
         
         return df
         
@@ -47,22 +112,27 @@ def verify_csv_data(csv_file):
 def create_quick_plot(df, output_file):
     """Create a quick verification plot"""
     try:
+        # Imported here so data-only runs (--no-plot) never pay for matplotlib;
+        # Agg skips interactive backend probing since we only write a file
+        os.environ.setdefault('MPLBACKEND', 'Agg')
+        import matplotlib.pyplot as plt
+        
         fig, ax = plt.subplots(figsize=(10, 6))
         
-        # Filter to 8-thread results
-        df_8t = df[df['threads'] == 8].copy()
-        df_8t = df_8t[df_8t['M'] == df_8t['N']]  # Square matrices
+        # Filter to 8-thread results on square matrices
+        df_8t = df.query('threads == 8 and M == N')
         
-        # Plot each implementation
-        impls = df_8t['impl'].unique()
-        colors = plt.cm.tab10(range(len(impls)))
+        # Plot each implementation: one sort, then one pass over the groups
+        groups = df_8t.sort_values('N').groupby('impl', sort=False, observed=True)
+        colors = plt.cm.tab10(range(groups.ngroups))
         
-        for impl, color in zip(impls, colors):
-            impl_data = df_8t[df_8t['impl'] == impl].sort_values('N')
-            if not impl_data.empty:
-                ax.plot(impl_data['N'], impl_data['gflops'], 
-                       marker='o', linewidth=2, markersize=6, 
-                       label=impl, color=color)
+        for (impl, impl_data), color in zip(groups, colors):
+            # Hand matplotlib plain arrays (NA sizes were dropped by the query above)
+            N_arr = impl_data['N'].to_numpy(dtype=np.int32)
+            gflops_arr = impl_data['gflops'].to_numpy(dtype=np.float32, copy=False)
+            ax.plot(N_arr, gflops_arr, 
+                   marker='o', linewidth=2, markersize=6, 
+                   label=impl, color=color, rasterized=True)
         
         ax.set_xlabel('Matrix Size (N×N×N)')
         ax.set_ylabel('Performance (GFLOP/s)')
@@ -71,10 +141,11 @@ def create_quick_plot(df, output_file):
         ax.grid(True, alpha=0.3)
         ax.legend()
         
-        plt.tight_layout()
-        plt.savefig(output_file, dpi=150, bbox_inches='tight')
+        # Tight layout is solved once while drawing; bbox_inches='tight' would render twice
+        fig.set_layout_engine('tight')
+        fig.savefig(output_file, dpi=100)
         print(f"✓ Verification plot saved: {output_file}")
-        plt.close()
+        plt.close(fig)
         
         return True
         
@@ -82,14 +153,30 @@ def create_quick_plot(df, output_file):
         print(f"❌ Error creating plot: {e}")
         return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Verify benchmark CSV data and plotting")
+    parser.add_argument('--no-plot', action='store_true',
+                        help="Only verify the CSV data; skip the verification plot")
+    return parser.parse_args()
+
 def main():
-    # Find the most recent CSV file
-    csv_files = list(pathlib.Path("data/runs").glob("*.csv"))
-    if not csv_files:
+    args = parse_args()
+    
+    # Find the most recent CSV file; DirEntry.stat() reuses readdir data
+    try:
+        with os.scandir("data/runs") as it:
+            latest = max(
+                (e for e in it if e.name.endswith(".csv") and e.is_file(follow_symlinks=False)),
+                key=lambda e: e.stat().st_mtime,
+                default=None,
+            )
+    except FileNotFoundError:
+        latest = None
+    if latest is None:
         print("❌ No CSV files found in data/runs/")
         return False
     
-    latest_csv = max(csv_files, key=lambda p: p.stat().st_mtime)
+    latest_csv = latest.path
     print(f"Using latest CSV: {latest_csv}")
     
     # Verify data
@@ -97,9 +184,13 @@ def main():
     if df is None:
         return False
     
+    if args.no_plot:
+        print("\n✅ Verification complete (plot skipped)")
+        return True
+    
     # Create verification plot
-    output_file = "results/plots/verification_plot.png"
-    pathlib.Path("results/plots").mkdir(parents=True, exist_ok=True)
+    output_file = os.path.join(RESULTS_PLOTS, "verification_plot.png")
+    os.makedirs(RESULTS_PLOTS, exist_ok=True)
     
     success = create_quick_plot(df, output_file)
     